@@ -0,0 +1,4 @@
+from esgocr.azure_client import AzureContentUnderstandingClient, Settings, get_client
+from esgocr.fields import pick
+
+__all__ = ["AzureContentUnderstandingClient", "Settings", "get_client", "pick"]
@@ -0,0 +1,425 @@
+import functools
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Top-level status markers of an operation that is still running. Only the start of
+# the body is checked, where the status field appears, so text inside a finished
+# result is very unlikely to match.
+_IN_PROGRESS_MARKERS = (
+    b'"status":"Running"',
+    b'"status":"NotStarted"',
+    b'"status":"running"',
+    b'"status":"notStarted"',
+)
+
+
+def _is_in_progress(body: bytes) -> bool:
+    """Returns True if the operation body reports a running status, without parsing it."""
+    head = body[:512]
+    return any(marker in head for marker in _IN_PROGRESS_MARKERS)
+
+
+# Environment variable the scripts read the subscription key from
+SUBSCRIPTION_KEY_ENV = "AZURE_CU_KEY"
+
+
+@dataclass(frozen=True, kw_only=True)
+class Settings:
+    endpoint: str
+    api_version: str
+    subscription_key: str | None = None
+    aad_token: str | None = None
+    analyzer_id: str
+
+    def __post_init__(self):
+        key_not_provided = (
+            not self.subscription_key
+            or self.subscription_key == "AZURE_CONTENT_UNDERSTANDING_SUBSCRIPTION_KEY"
+        )
+        token_not_provided = (
+            not self.aad_token
+            or self.aad_token == "AZURE_CONTENT_UNDERSTANDING_AAD_TOKEN"
+        )
+        if key_not_provided and token_not_provided:
+            raise ValueError(
+                "Either 'subscription_key' or 'aad_token' must be provided"
+            )
+        # Built once; the dataclass is frozen, so bypass its __setattr__
+        object.__setattr__(
+            self,
+            "_token_provider",
+            (lambda t=self.aad_token: t) if self.aad_token else None,
+        )
+
+    @classmethod
+    def from_env(cls, *, endpoint: str, api_version: str, analyzer_id: str) -> "Settings":
+        """Builds settings with the subscription key taken from the AZURE_CU_KEY environment variable."""
+        subscription_key = os.environ.get(SUBSCRIPTION_KEY_ENV)
+        if not subscription_key:
+            raise ValueError(
+                f"Set the {SUBSCRIPTION_KEY_ENV} environment variable to your "
+                "Content Understanding subscription key"
+            )
+        return cls(
+            endpoint=endpoint,
+            api_version=api_version,
+            subscription_key=subscription_key,
+            analyzer_id=analyzer_id,
+        )
+
+    @property
+    def token_provider(self) -> Callable[[], str] | None:
+        return self._token_provider
+
+
+class AzureContentUnderstandingClient:
+    # Per-request headers; auth headers are set once on the session
+    _JSON_HEADERS = {"Content-Type": "application/json"}
+    _OCTET_HEADERS = {"Content-Type": "application/octet-stream"}
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        initial_delay: float = 1.0,
+        multiplier: float = 1.5,
+        max_delay: float = 30.0,
+        pool_maxsize: int = 16,
+    ) -> None:
+        if not subscription_key and token_provider is None:
+            raise ValueError(
+                "Either subscription key or token provider must be provided"
+            )
+        if not api_version:
+            raise ValueError("API version must be provided")
+        if not endpoint:
+            raise ValueError("Endpoint must be provided")
+
+        self._endpoint: str = endpoint.rstrip("/")
+        self._api_version: str = api_version
+        # Polling backoff: wait initial_delay, then grow by multiplier up to max_delay
+        self._initial_delay: float = initial_delay
+        self._multiplier: float = multiplier
+        self._max_delay: float = max_delay
+        # The level is left to the application's logging configuration
+        self._logger: logging.Logger = logging.getLogger(__name__)
+        self._headers: dict[str, str] = self._get_headers(
+            subscription_key, token_provider and token_provider(), x_ms_useragent
+        )
+        # Shared session so connections and TLS handshakes are reused across calls and threads
+        self._session: requests.Session = requests.Session()
+        self._session.headers.update(self._headers)
+        retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=retries)
+        self._session.mount("https://", adapter)
+        # Analyze URLs are built once per analyzer and reused
+        self._analyze_urls: dict[str, str] = {}
+
+    def close(self) -> None:
+        """Closes the underlying HTTP session and its pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> "AzureContentUnderstandingClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def begin_analyze(self, analyzer_id: str, file_location: str):
+        """
+        Begins the analysis of a file or URL using the specified analyzer.
+
+        Callers that already know which kind of location they have should use
+        begin_analyze_file or begin_analyze_url directly.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to use.
+            file_location (str): The path to the file or the URL to analyze.
+
+        Returns:
+            Response: The response from the analysis request.
+
+        Raises:
+            ValueError: If the file location is not a valid path or URL.
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        # Check the cheap URL prefix before touching the filesystem
+        if file_location.startswith(("https://", "http://")):
+            return self.begin_analyze_url(analyzer_id, file_location)
+        elif Path(file_location).exists():
+            return self.begin_analyze_file(analyzer_id, file_location)
+        else:
+            raise ValueError("File location must be a valid path or URL.")
+
+    def begin_analyze_file(self, analyzer_id: str, path: str | os.PathLike):
+        """
+        Begins the analysis of a local file, streaming it to the service.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to use.
+            path (str | PathLike): The path to the file to analyze.
+
+        Returns:
+            Response: The response from the analysis request.
+
+        Raises:
+            OSError: If the file cannot be opened.
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        url = self._get_cached_analyze_url(analyzer_id)
+        
+        self._logger.info(f"Analyzing file {path} with analyzer: {analyzer_id}")
+        self._logger.info(f"POST request to: {url}")
+        
+        # Stream the file from disk instead of reading it into memory
+        with open(path, "rb") as file:
+            # Size the body from the open handle so it matches exactly what is sent
+            headers = {**self._OCTET_HEADERS, "Content-Length": str(os.fstat(file.fileno()).st_size)}
+            response = self._session.post(
+                url=url,
+                headers=headers,
+                data=file,
+            )
+
+        if response.status_code >= 400:
+            response.raise_for_status()
+        return response
+
+    def begin_analyze_url(self, analyzer_id: str, url: str):
+        """
+        Begins the analysis of a document the service downloads from a URL.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to use.
+            url (str): The URL of the document to analyze.
+
+        Returns:
+            Response: The response from the analysis request.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        analyze_url = self._get_cached_analyze_url(analyzer_id)
+        
+        self._logger.info(f"Analyzing file {url} with analyzer: {analyzer_id}")
+        self._logger.info(f"POST request to: {analyze_url}")
+        
+        response = self._session.post(
+            url=analyze_url,
+            headers=self._JSON_HEADERS,
+            json={"url": url},
+        )
+
+        if response.status_code >= 400:
+            response.raise_for_status()
+        return response
+
+    def create_analyzer(self, analyzer_id: str, analyzer_definition: dict[str, Any]):
+        """
+        Creates a new analyzer with the specified ID and definition.
+
+        Args:
+            analyzer_id (str): The ID to assign to the new analyzer.
+            analyzer_definition (dict): The definition of the analyzer.
+
+        Returns:
+            Response: The response from the create analyzer request.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        url = self._get_analyzer_url(self._endpoint, self._api_version, analyzer_id)
+        self._logger.info(f"Creating analyzer: {analyzer_id}")
+        # Lazy %-formatting: the definition and response are only rendered at DEBUG level
+        self._logger.debug("PUT %s body=%s", url, analyzer_definition)
+        
+        response = self._session.put(
+            url=url,
+            headers=self._JSON_HEADERS,
+            json=analyzer_definition,
+        )
+
+        # response.text decodes the body eagerly, so check the level first
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("Response status=%s body=%s", response.status_code, response.text)
+        if response.status_code >= 400:
+            response.raise_for_status()
+        return response
+
+    def delete_analyzer(self, analyzer_id: str):
+        """
+        Deletes an existing analyzer with the specified ID.
+        This is a synchronous operation that returns a 204 No Content status code on success.
+
+        Args:
+            analyzer_id (str): The ID of the analyzer to delete.
+
+        Returns:
+            Response: The response from the delete analyzer request.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        url = self._get_analyzer_url(self._endpoint, self._api_version, analyzer_id)
+        self._logger.info(f"Deleting analyzer: {analyzer_id}")
+        
+        response = self._session.delete(url=url)
+
+        if response.status_code >= 400:
+            response.raise_for_status()
+        return response
+
+    def poll_result(
+        self,
+        response: requests.Response,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: float | None = None,
+    ) -> dict[str, Any]:
+        """
+        Polls the result of an asynchronous operation until it completes or times out.
+
+        Works for both analyze operations (which end as "succeeded") and analyzer
+        creation (which ends as "ready"). See poll_result_raw for the polling details.
+        """
+        result, _ = self.poll_result_raw(response, timeout_seconds, polling_interval_seconds)
+        return result
+
+    def poll_result_raw(
+        self,
+        response: requests.Response,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: float | None = None,
+    ) -> tuple[dict[str, Any], bytes]:
+        """
+        Polls like poll_result, but also returns the final response body as received,
+        so callers can store it without serializing the parsed result again.
+
+        The delay between polls starts at ``polling_interval_seconds`` (or the client's
+        ``initial_delay``) and grows by ``multiplier`` up to ``max_delay``, with a little
+        random jitter added to each sleep. A ``Retry-After`` header from the service can
+        lengthen the wait but never shortens it below the backoff delay. No single wait
+        is longer than ``max_delay``, jitter and Retry-After included. If the service
+        returns an ETag, it is sent back as If-None-Match so unchanged polls return 304
+        without a body, and bodies that still report a running status are not parsed.
+        """
+        operation_location = response.headers.get("operation-location", "")
+        if not operation_location:
+            raise ValueError("Operation location not found in response headers.")
+
+        start_time = time.monotonic()
+        deadline = start_time + timeout_seconds
+        delay = polling_interval_seconds or self._initial_delay
+        last_etag = None
+        while True:
+            elapsed_time = time.monotonic() - start_time
+            self._logger.info(
+                f"Waiting for service response (elapsed: {elapsed_time:.2f}s)"
+            )
+
+            # Send the last ETag so an unchanged operation comes back as 304 with no body
+            response = self._session.get(
+                operation_location,
+                headers={"If-None-Match": last_etag} if last_etag else None,
+            )
+            if response.status_code >= 400:
+                response.raise_for_status()
+            last_etag = response.headers.get("ETag", last_etag)
+            # Skip parsing when nothing changed or the body still reports a running status
+            if response.status_code == 304 or _is_in_progress(response.content):
+                self._logger.info(
+                    f"Request in progress... (elapsed: {elapsed_time:.2f}s)"
+                )
+            else:
+                result = orjson.loads(response.content)
+                status = result.get("status", "").lower()
+                if status == "succeeded" or status == "ready":
+                    self._logger.info(
+                        f"Request result is ready after {elapsed_time:.2f} seconds."
+                    )
+                    return result, response.content
+                elif status == "failed":
+                    self._logger.error(f"Request failed. Reason: {result}")
+                    raise RuntimeError(f"Request failed: {result}")
+                else:
+                    self._logger.info(
+                        f"Request in progress... (elapsed: {elapsed_time:.2f}s)"
+                    )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"Operation timed out after {timeout_seconds:.2f} seconds."
+                )
+            # Honor the service's Retry-After hint, with our backoff as the floor
+            sleep_for = min(
+                self._max_delay,
+                max(
+                    self._get_retry_after(response),
+                    delay + random.uniform(0, 0.25 * delay),
+                ),
+            )
+            # Sleep at most until the deadline so there is one final check before timing out
+            time.sleep(min(sleep_for, remaining))
+            delay = min(self._max_delay, delay * self._multiplier)
+
+    def _get_retry_after(self, response: requests.Response) -> float:
+        """Returns the Retry-After header in seconds, or 0 if it is missing or not numeric."""
+        try:
+            return float(response.headers.get("Retry-After", 0))
+        except ValueError:
+            return 0.0
+
+    def _get_cached_analyze_url(self, analyzer_id: str) -> str:
+        url = self._analyze_urls.get(analyzer_id)
+        if url is None:
+            url = self._get_analyze_url(self._endpoint, self._api_version, analyzer_id)
+            self._analyze_urls[analyzer_id] = url
+        return url
+
+    def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
+        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}"
+
+    def _get_analyzer_url(self, endpoint: str, api_version: str, analyzer_id: str):
+        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}?api-version={api_version}"
+
+    def _get_headers(
+        self, subscription_key: str | None, api_token: str | None, x_ms_useragent: str
+    ) -> dict[str, str]:
+        """Returns the headers for the HTTP requests."""
+        headers = (
+            {"Ocp-Apim-Subscription-Key": subscription_key}
+            if subscription_key
+            else {"Authorization": f"Bearer {api_token}"}
+        )
+        headers["x-ms-useragent"] = x_ms_useragent
+        return headers
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(settings: Settings, pool_maxsize: int = 16) -> AzureContentUnderstandingClient:
+    """Builds one client per settings so repeated calls reuse its session and connection pool."""
+    return AzureContentUnderstandingClient(
+        settings.endpoint,
+        settings.api_version,
+        subscription_key=settings.subscription_key,
+        token_provider=settings.token_provider,
+        pool_maxsize=pool_maxsize,
+    )
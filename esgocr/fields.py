@@ -0,0 +1,8 @@
+def pick(d, *path, default="Not found"):
+    """Walk nested dicts along ``path``, returning ``default`` if any key is missing."""
+    cur = d
+    for key in path:
+        cur = cur.get(key) if isinstance(cur, dict) else None
+        if cur is None:
+            return default
+    return cur